@@ -1,19 +1,38 @@
 import os
 import json
+import logging
+import shutil
+import sqlite3
 import tempfile
 import asyncio
 import time
 import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import cache, lru_cache
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
 import pandas as pd
 from dotenv import load_dotenv
+import httpx
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
+from telegram.request import HTTPXRequest
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 import yt_dlp
 
+try:
+    import orjson
+except ImportError:  # optional speed-up; fall back to stdlib json
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ── Core config ───────────────────────────────────────────────────────────────
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
@@ -26,7 +45,7 @@ if _admin_raw:
     try:
         ADMIN_USER_ID = int(_admin_raw)
     except ValueError:
-        print(f"Warning: ADMIN_USER_ID '{_admin_raw}' is not a valid integer, ignoring.")
+        logger.warning("ADMIN_USER_ID %r is not a valid integer, ignoring.", _admin_raw)
 
 # Report channel — receives new-user notifications + CSV
 REPORT_CHANNEL = None
@@ -37,9 +56,70 @@ if _report_raw:
     except ValueError:
         REPORT_CHANNEL = f"@{_report_raw}"
 
+# Write timeout (seconds) for multipart uploads: audio files and CSV exports
+UPLOAD_WRITE_TIMEOUT = 60
+
+# Download workers — how many yt-dlp downloads may run at once
+DL_WORKERS = 6
+_workers_raw = os.getenv("DL_WORKERS", "").strip()
+if _workers_raw:
+    try:
+        DL_WORKERS = max(1, int(_workers_raw))
+    except ValueError:
+        logger.warning("DL_WORKERS %r is not a valid integer, using %d.", _workers_raw, DL_WORKERS)
+
+
+# ── JSON state files ──────────────────────────────────────────────────────────
+def read_json(path: str):
+    """Parse a JSON file, using orjson when it is installed."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def write_json(path: str, obj, indent: bool = False):
+    """Atomically serialize obj to a JSON file, using orjson when it is installed.
+
+    Data goes to a temp file that then replaces path, so a crash mid-write
+    never leaves a truncated file behind.
+    """
+    if orjson:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    else:
+        data = json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+SAVE_DELAY = 5  # seconds to coalesce state changes before writing
+
+# save function -> pending task
+_pending_saves: dict = {}
+
+
+async def _save_later(save_fn):
+    await asyncio.sleep(SAVE_DELAY)
+    del _pending_saves[save_fn]
+    try:
+        save_fn()
+    except Exception as e:
+        logger.error("Failed to save state (%s): %s", save_fn.__name__, e)
+
+
+def schedule_save(save_fn):
+    """Call save_fn after SAVE_DELAY, folding bursts of changes into one write."""
+    if save_fn not in _pending_saves:
+        _pending_saves[save_fn] = asyncio.create_task(_save_later(save_fn))
+
+
 # ── Sponsor channels ──────────────────────────────────────────────────────────
 CHANNELS_FILE = "channels.json"
 
+# Parsed contents of CHANNELS_FILE; refreshed by save_sponsor_channels()
+_SPONSOR_CACHE = None
+
 
 def _channels_from_env() -> list:
     """Read sponsor channels from env (SPONSOR_CHANNELS or legacy single-channel vars)."""
@@ -53,10 +133,13 @@ def _channels_from_env() -> list:
 
 def load_sponsor_channels() -> list:
     """Return current list of sponsor channels (from file, seeded from env on first run)."""
+    global _SPONSOR_CACHE
+    if _SPONSOR_CACHE is not None:
+        return list(_SPONSOR_CACHE)
     if os.path.exists(CHANNELS_FILE):
         try:
-            with open(CHANNELS_FILE, "r") as f:
-                return json.load(f).get("channels", [])
+            _SPONSOR_CACHE = read_json(CHANNELS_FILE).get("channels", [])
+            return list(_SPONSOR_CACHE)
         except Exception:
             pass
     # First run — seed from env and persist
@@ -67,91 +150,195 @@ def load_sponsor_channels() -> list:
 
 def save_sponsor_channels(channels: list):
     """Persist sponsor channels to file."""
-    with open(CHANNELS_FILE, "w") as f:
-        json.dump({"channels": channels}, f, indent=2)
+    global _SPONSOR_CACHE
+    write_json(CHANNELS_FILE, {"channels": channels}, indent=True)
+    _SPONSOR_CACHE = list(channels)
+    _BTN_CACHE.clear()
+    _MEMBERSHIP_CACHE.clear()  # a new channel must be re-checked for everyone
+    _BOT_ADMIN_CACHE.clear()
+
 
+def _is_int_id(s: str) -> bool:
+    """True for numeric chat IDs such as "-1001234567890"."""
+    return s[1:].isdecimal() if s.startswith("-") else s.isdecimal()
 
+
+@lru_cache(maxsize=64)
 def parse_channel(ch: str):
     """Convert a channel string to the value used in Telegram API calls."""
     ch = ch.strip().lstrip("@")
-    try:
-        return int(ch)
-    except ValueError:
-        return f"@{ch}"
+    return int(ch) if _is_int_id(ch) else f"@{ch}"
 
 
+@lru_cache(maxsize=64)
 def channel_join_url(ch: str):
     """Return a t.me join URL for username-based channels, None for numeric IDs."""
     ch_clean = ch.strip().lstrip("@")
-    try:
-        int(ch_clean)   # numeric → private channel, can't auto-generate link
-        return None
-    except ValueError:
-        return f"https://t.me/{ch_clean}"
+    if _is_int_id(ch_clean):
+        return None  # numeric → private channel, can't auto-generate link
+    return f"https://t.me/{ch_clean}"
 
 
 # ── User language preferences ─────────────────────────────────────────────────
+LANG_FILE = "user_languages.json"  # legacy store, imported into DB_FILE on first run
+
 user_languages: dict = {}
 
-# ── CSV database ──────────────────────────────────────────────────────────────
-CSV_FILE = "users.csv"
 
+def load_user_languages():
+    """Restore saved language choices so returning users aren't asked again."""
+    empty = _db.execute("SELECT 1 FROM languages LIMIT 1").fetchone() is None
+    if empty and os.path.exists(LANG_FILE):
+        try:
+            rows = [(int(k), v) for k, v in read_json(LANG_FILE).items()]
+            _db.executemany("INSERT OR REPLACE INTO languages VALUES (?, ?)", rows)
+            logger.info("Imported %d language choices from %s into %s", len(rows), LANG_FILE, DB_FILE)
+        except Exception as e:
+            logger.error("Failed to import %s: %s", LANG_FILE, e)
+    user_languages.update(_db.execute("SELECT user_id, code FROM languages"))
 
-def init_db():
-    """Create users.csv if missing, or migrate from old single-column schema."""
-    if not os.path.exists(CSV_FILE):
-        pd.DataFrame(columns=["user_id", "datetime_added"]).to_csv(CSV_FILE, index=False)
-        print(f"Created {CSV_FILE}")
-        return
 
+def set_user_language(user_id: int, lang_code: str):
+    """Record a user's language in memory and write it through to the database."""
+    user_languages[user_id] = lang_code
+    _db.execute("INSERT OR REPLACE INTO languages VALUES (?, ?)", (user_id, lang_code))
+
+
+# ── User database ─────────────────────────────────────────────────────────────
+DB_FILE = "users.db"
+CSV_FILE = "users.csv"  # legacy store, imported into DB_FILE on first run
+
+USER_FLUSH_INTERVAL = 1  # seconds to batch new-user inserts
+
+_db = None
+
+# In-memory mirror of users.user_id, loaded once by init_db()
+_USER_IDS: set = set()
+# (user_id, datetime_added) rows waiting for user_writer_loop()
+_WRITE_Q: asyncio.Queue = asyncio.Queue()
+# Rows already taken off _WRITE_Q by the writer but not yet written
+_HELD_ROWS: list = []
+
+
+def _import_legacy_csv():
+    """Copy users from an existing users.csv (old or new schema) into the database."""
     df = pd.read_csv(CSV_FILE)
-    changed = False
 
-    # Migrate old "users" column → "user_id"
+    # Old "users" column → "user_id"
     if "users" in df.columns and "user_id" not in df.columns:
         df.rename(columns={"users": "user_id"}, inplace=True)
-        changed = True
-
-    # Add missing "datetime_added" column
+    if "user_id" not in df.columns:
+        return
     if "datetime_added" not in df.columns:
         df["datetime_added"] = ""
-        changed = True
 
-    if changed:
-        df.to_csv(CSV_FILE, index=False)
-        print("Migrated users.csv to new schema (user_id + datetime_added).")
+    df = df.dropna(subset=["user_id"])
+    rows = [
+        (int(uid), "" if pd.isna(added) else str(added))
+        for uid, added in zip(df["user_id"], df["datetime_added"])
+    ]
+    _db.executemany("INSERT OR IGNORE INTO users VALUES (?, ?)", rows)
+    logger.info("Imported %d users from %s into %s", len(rows), CSV_FILE, DB_FILE)
 
 
-def is_user_registered(user_id: int) -> bool:
-    df = pd.read_csv(CSV_FILE)
-    if "user_id" not in df.columns:
-        return False
-    return int(user_id) in df["user_id"].values
+def init_db():
+    """Open users.db, import legacy CSV/JSON stores once, and load the saved state."""
+    global _db
+    _db = sqlite3.connect(DB_FILE, isolation_level=None)
+    _db.execute("PRAGMA journal_mode=WAL")
+    _db.execute("PRAGMA synchronous=NORMAL")
+    _db.execute(
+        "CREATE TABLE IF NOT EXISTS users(user_id INTEGER PRIMARY KEY, datetime_added TEXT)"
+    )
+    _db.execute("CREATE TABLE IF NOT EXISTS languages(user_id INTEGER PRIMARY KEY, code TEXT)")
+
+    empty = _db.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+    if empty and os.path.exists(CSV_FILE):
+        _import_legacy_csv()
+
+    _USER_IDS.clear()
+    _USER_IDS.update(uid for (uid,) in _db.execute("SELECT user_id FROM users"))
+    logger.info("Loaded %d users from %s", len(_USER_IDS), DB_FILE)
+
+    load_user_languages()
+    load_track_cache()
 
 
 def register_user(user_id: int) -> bool:
-    """Add user to CSV. Returns True if this is a brand-new user."""
-    if is_user_registered(user_id):
+    """Add user to the database. Returns True if this is a brand-new user.
+
+    The in-memory set is updated immediately; the row itself is queued and
+    written by user_writer_loop() in batches.
+    """
+    uid = int(user_id)
+    if uid in _USER_IDS:
         return False
-    df = pd.read_csv(CSV_FILE)
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    new_row = pd.DataFrame({"user_id": [int(user_id)], "datetime_added": [now]})
-    df = pd.concat([df, new_row], ignore_index=True)
-    df.to_csv(CSV_FILE, index=False)
-    print(f"New user registered: {user_id} at {now}")
+    _USER_IDS.add(uid)
+    _WRITE_Q.put_nowait((uid, now))
+    logger.info("New user registered: %s at %s", uid, now)
     return True
 
 
+def flush_user_rows():
+    """Write every held and queued registration in a single executemany."""
+    rows = _HELD_ROWS[:]
+    _HELD_ROWS.clear()
+    while not _WRITE_Q.empty():
+        rows.append(_WRITE_Q.get_nowait())
+    if rows:
+        _db.executemany("INSERT OR IGNORE INTO users VALUES (?, ?)", rows)
+
+
+async def user_writer_loop():
+    """Background task: batch queued registrations into one write per USER_FLUSH_INTERVAL."""
+    while True:
+        # Block until there is work, then let a burst accumulate before writing.
+        # The first row is parked in _HELD_ROWS so an export during the wait
+        # (flush_user_rows() from export_users_csv) still writes it.
+        _HELD_ROWS.append(await _WRITE_Q.get())
+        try:
+            await asyncio.sleep(USER_FLUSH_INTERVAL)
+        finally:
+            try:
+                flush_user_rows()
+            except Exception as e:
+                logger.error("Failed to write new users to %s: %s", DB_FILE, e)
+
+
+def export_users_csv() -> BytesIO:
+    """Render the users table as an in-memory CSV file."""
+    flush_user_rows()
+    buf = BytesIO()
+    pd.read_sql("SELECT * FROM users", _db).to_csv(buf, index=False)
+    buf.seek(0)
+    return buf
+
+
 def get_all_user_ids() -> list:
-    df = pd.read_csv(CSV_FILE)
-    if "user_id" not in df.columns:
-        return []
-    return df["user_id"].dropna().astype(int).tolist()
+    return list(_USER_IDS)
 
 
 # ── Report channel helpers ────────────────────────────────────────────────────
+CSV_PUSH_INTERVAL = 300  # seconds between users.csv uploads to the report channel
+
+_CSV_PUSH_LOCK = asyncio.Lock()
+_LAST_CSV_PUSH = 0.0
+
+
+async def _csv_push_due() -> bool:
+    """Return True (and start a new window) if the CSV may be re-sent now."""
+    global _LAST_CSV_PUSH
+    async with _CSV_PUSH_LOCK:
+        now = time.time()
+        if now - _LAST_CSV_PUSH < CSV_PUSH_INTERVAL:
+            return False
+        _LAST_CSV_PUSH = now
+        return True
+
+
 async def notify_new_user(context, user_id: int, user):
-    """Send new-user notification text + updated CSV to the report channel."""
+    """Send new-user notification text, plus the CSV at most once per CSV_PUSH_INTERVAL."""
     if not REPORT_CHANNEL:
         return
     try:
@@ -171,17 +358,27 @@ async def notify_new_user(context, user_id: int, user):
             text=text,
             parse_mode="HTML"
         )
-        with open(CSV_FILE, "rb") as f:
-            df = pd.read_csv(CSV_FILE)
-            total = len(df)
-            await context.bot.send_document(
-                chat_id=REPORT_CHANNEL,
-                document=f,
-                filename="users.csv",
-                caption=f"📊 Updated users list — {total} total users ({now})"
-            )
+        if not await _csv_push_due():
+            return
+        total = len(_USER_IDS)
+        await context.bot.send_document(
+            chat_id=REPORT_CHANNEL,
+            document=export_users_csv(),
+            filename="users.csv",
+            write_timeout=UPLOAD_WRITE_TIMEOUT,
+            caption=f"📊 Updated users list — {total} total users ({now})"
+        )
     except Exception as e:
-        print(f"Failed to notify report channel: {e}")
+        logger.warning("Failed to notify report channel: %s", e)
+
+
+async def ensure_registered(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Register the sender on first contact and notify the report channel."""
+    user = update.effective_user
+    if user.id in _USER_IDS:
+        return
+    if register_user(user.id):
+        await notify_new_user(context, user.id, user)
 
 
 # ── Translations ──────────────────────────────────────────────────────────────
@@ -237,23 +434,124 @@ TRANSLATIONS = {
 }
 
 
+# Flattened per-language tables with English fallbacks merged in, so t() needs one lookup
+_T = {lang: {**TRANSLATIONS['en'], **strings} for lang, strings in TRANSLATIONS.items()}
+
+
 def get_user_language(user_id: int) -> str:
-    return user_languages.get(user_id, 'en')
+    lang = user_languages.get(user_id, 'en')
+    return lang if lang in _T else 'en'  # unknown stored codes fall back to English
 
 
 def t(key: str, user_id: int, **kwargs) -> str:
-    lang = get_user_language(user_id)
-    text = TRANSLATIONS[lang].get(key, TRANSLATIONS['en'].get(key, key))
+    text = _T[get_user_language(user_id)].get(key, key)
+    return text.format(**kwargs) if kwargs else text
+
+
+@cache
+def _paragraphs(lang: str, keys: tuple) -> str:
+    strings = _T[lang]
+    return "\n\n".join(strings.get(key, key) for key in keys)
+
+
+def tp(user_id: int, *keys: str, **kwargs) -> str:
+    """Translate several keys and join them as paragraphs; the joined template is cached per language."""
+    text = _paragraphs(get_user_language(user_id), keys)
     return text.format(**kwargs) if kwargs else text
 
 
 # ── Membership helpers ────────────────────────────────────────────────────────
+MEMBERSHIP_TTL = 300  # seconds a verified "joined everything" result is trusted
+
+# user_id -> time.monotonic() when the user was last verified in all channels,
+# oldest first, so expired entries can be pruned from the front
+_MEMBERSHIP_CACHE: OrderedDict = OrderedDict()
+
+
+def _remember_membership(user_id: int):
+    now = time.monotonic()
+    _MEMBERSHIP_CACHE[user_id] = now
+    _MEMBERSHIP_CACHE.move_to_end(user_id)
+    # Drop expired entries so the cache only holds users verified within MEMBERSHIP_TTL
+    while _MEMBERSHIP_CACHE:
+        oldest_id, verified_at = next(iter(_MEMBERSHIP_CACHE.items()))
+        if now - verified_at < MEMBERSHIP_TTL:
+            break
+        del _MEMBERSHIP_CACHE[oldest_id]
+
+
+BOT_ADMIN_TTL = 3600  # seconds the bot's own admin status in a channel is trusted
+
+# channel -> (bot is creator/administrator, time.monotonic() when checked)
+_BOT_ADMIN_CACHE: dict = {}
+
+
+async def _bot_is_admin(context: ContextTypes.DEFAULT_TYPE, ch: str) -> bool:
+    """Return whether the bot administers ch, hitting the API at most once per BOT_ADMIN_TTL."""
+    cached = _BOT_ADMIN_CACHE.get(ch)
+    if cached is not None and time.monotonic() - cached[1] < BOT_ADMIN_TTL:
+        return cached[0]
+    # context.bot.id is populated by Application.initialize(), so no get_me() is needed
+    bot_member = await context.bot.get_chat_member(chat_id=parse_channel(ch), user_id=context.bot.id)
+    admin = bot_member.status in ['creator', 'administrator']
+    _BOT_ADMIN_CACHE[ch] = (admin, time.monotonic())
+    return admin
+
+
+ADMIN_REFRESH_INTERVAL = 600  # seconds between channel administrator snapshots
+
+# channel -> set of administrator user IDs, rebuilt by admin_refresh_loop()
+_CHANNEL_ADMINS: dict = {}
+
+
+async def refresh_channel_admins(bot):
+    """Snapshot every sponsor channel's administrators with one API call per channel."""
+    channels = load_sponsor_channels()
+
+    async def _fetch(ch: str):
+        admins = await bot.get_chat_administrators(chat_id=parse_channel(ch))
+        return {m.user.id for m in admins}
+
+    results = await asyncio.gather(*(_fetch(ch) for ch in channels), return_exceptions=True)
+    snapshot = {}
+    for ch, result in zip(channels, results):
+        if isinstance(result, Exception):
+            logger.debug("Could not list admins of %s: %s", ch, result)
+            # Keep the previous snapshot for this channel, if any
+            result = _CHANNEL_ADMINS.get(ch)
+        if result is not None:
+            snapshot[ch] = result
+    _CHANNEL_ADMINS.clear()
+    _CHANNEL_ADMINS.update(snapshot)
+
+
+async def admin_refresh_loop(bot):
+    """Background task: keep _CHANNEL_ADMINS fresh every ADMIN_REFRESH_INTERVAL."""
+    while True:
+        try:
+            await refresh_channel_admins(bot)
+        except Exception as e:
+            logger.warning("Failed to refresh channel admins: %s", e)
+        await asyncio.sleep(ADMIN_REFRESH_INTERVAL)
+
+
 async def get_unjoined_channels(update: Update, context: ContextTypes.DEFAULT_TYPE) -> list:
     """Return list of sponsor channels the user has NOT joined."""
     user_id = update.effective_user.id
+    verified_at = _MEMBERSHIP_CACHE.get(user_id)
+    if verified_at is not None:
+        if time.monotonic() - verified_at < MEMBERSHIP_TTL:
+            return []
+        del _MEMBERSHIP_CACHE[user_id]
+
     channels = load_sponsor_channels()
-    unjoined = []
-    for ch in channels:
+    uncertain = False  # an API error let the user through without a real answer
+
+    async def _check(ch: str):
+        """Return ch if the user has not joined it, else None."""
+        nonlocal uncertain
+        if user_id in _CHANNEL_ADMINS.get(ch, ()):
+            return None  # channel admins are members by definition; skip the API call
         try:
             member = await context.bot.get_chat_member(
                 chat_id=parse_channel(ch), user_id=user_id
@@ -262,41 +560,62 @@ async def get_unjoined_channels(update: Update, context: ContextTypes.DEFAULT_TY
             is_in = member.status in valid_statuses
             if member.status == 'restricted':
                 is_in = getattr(member, 'can_send_messages', False)
-            if not is_in:
-                unjoined.append(ch)
+            return None if is_in else ch
         except Exception as e:
             err = str(e)
             if "Member list is inaccessible" in err:
                 # Fallback: check bot's own status
                 try:
-                    bot_info = await context.bot.get_me()
-                    bot_member = await context.bot.get_chat_member(
-                        chat_id=parse_channel(ch), user_id=bot_info.id
-                    )
-                    if bot_member.status not in ['creator', 'administrator']:
-                        unjoined.append(ch)
+                    if not await _bot_is_admin(context, ch):
+                        return ch
                 except Exception:
-                    pass
+                    uncertain = True
             else:
-                print(f"Error checking channel {ch} for user {user_id}: {e}")
+                logger.warning("Error checking channel %s for user %s: %s", ch, user_id, e)
                 # Don't block user on unexpected API errors
+                uncertain = True
+            return None
+
+    results = await asyncio.gather(*(_check(ch) for ch in channels), return_exceptions=True)
+    unjoined = [r for r in results if isinstance(r, str)]
+    if unjoined or uncertain:
+        _MEMBERSHIP_CACHE.pop(user_id, None)
+    else:
+        _remember_membership(user_id)
     return unjoined
 
 
+_LANG_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("English 🇺🇸", callback_data="lang_en")],
+    [InlineKeyboardButton("فارسی 🇮🇷", callback_data="lang_fa")]
+])
+
+
+# Join-button rows per (channel, language); cleared when the sponsor list changes
+_BTN_CACHE: dict = {}
+_JOINED_BTN = {
+    lang: InlineKeyboardButton(strings['i_joined'], callback_data="check_membership")
+    for lang, strings in _T.items()
+}
+
+
+def _join_row(ch: str, lang: str):
+    """Return the cached [button] row for a channel, or None if it has no public link."""
+    key = (ch, lang)
+    if key not in _BTN_CACHE:
+        url = channel_join_url(ch)
+        display = ch.strip().lstrip("@")
+        _BTN_CACHE[key] = [
+            InlineKeyboardButton(_T[lang]['join_channel'].format(name=f"@{display}"), url=url)
+        ] if url else None
+    return _BTN_CACHE[key]
+
+
 def build_join_keyboard(unjoined: list, user_id: int) -> InlineKeyboardMarkup:
     """Build inline keyboard with a join button per unjoined channel + I Joined button."""
-    keyboard = []
-    for ch in unjoined:
-        url = channel_join_url(ch)
-        if url:
-            display = ch.strip().lstrip("@")
-            keyboard.append([
-                InlineKeyboardButton(
-                    t('join_channel', user_id, name=f"@{display}"),
-                    url=url
-                )
-            ])
-    keyboard.append([InlineKeyboardButton(t('i_joined', user_id), callback_data="check_membership")])
+    lang = get_user_language(user_id)
+    keyboard = [row for row in (_join_row(ch, lang) for ch in unjoined) if row]
+    keyboard.append([_JOINED_BTN[lang]])
     return InlineKeyboardMarkup(keyboard)
 
 
@@ -311,34 +630,24 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     user_id = user.id
 
-    is_new = register_user(user_id)
-    if is_new:
-        await notify_new_user(context, user_id, user)
+    await ensure_registered(update, context)
 
     # Language selection first
     if user_id not in user_languages:
-        keyboard = [
-            [InlineKeyboardButton("English 🇺🇸", callback_data="lang_en")],
-            [InlineKeyboardButton("فارسی 🇮🇷", callback_data="lang_fa")]
-        ]
         await update.message.reply_text(
             "Please select your language / لطفا زبان خود را انتخاب کنید",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=_LANG_KEYBOARD
         )
         return
 
     unjoined = await get_unjoined_channels(update, context)
     if not unjoined:
         await update.message.reply_text(
-            f"{t('hello', user_id, name=user.first_name)}\n\n"
-            f"{t('already_member', user_id)}\n\n"
-            f"{t('send_link', user_id)}"
+            tp(user_id, 'hello', 'already_member', 'send_link', name=user.first_name)
         )
     else:
         await update.message.reply_text(
-            f"{t('hello', user_id, name=user.first_name)}\n\n"
-            f"{t('join_channel_first', user_id)}\n\n"
-            f"{t('join_and_click', user_id)}",
+            tp(user_id, 'hello', 'join_channel_first', 'join_and_click', name=user.first_name),
             reply_markup=build_join_keyboard(unjoined, user_id)
         )
 
@@ -348,24 +657,23 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
+    lang_code = query.data.split('_', 1)[1]  # lang_en or lang_fa
+    if lang_code not in _T:
+        return  # forged or stale callback data
+
     user_id = query.from_user.id
-    register_user(user_id)
+    await ensure_registered(update, context)
 
-    lang_code = query.data.split('_')[1]  # lang_en or lang_fa
-    user_languages[user_id] = lang_code
+    set_user_language(user_id, lang_code)
 
     unjoined = await get_unjoined_channels(update, context)
     if not unjoined:
         await query.edit_message_text(
-            f"{t('hello', user_id, name=query.from_user.first_name)}\n\n"
-            f"{t('already_member', user_id)}\n\n"
-            f"{t('send_link', user_id)}"
+            tp(user_id, 'hello', 'already_member', 'send_link', name=query.from_user.first_name)
         )
     else:
         await query.edit_message_text(
-            f"{t('hello', user_id, name=query.from_user.first_name)}\n\n"
-            f"{t('join_channel_first', user_id)}\n\n"
-            f"{t('join_and_click', user_id)}",
+            tp(user_id, 'hello', 'join_channel_first', 'join_and_click', name=query.from_user.first_name),
             reply_markup=build_join_keyboard(unjoined, user_id)
         )
 
@@ -376,23 +684,26 @@ async def check_membership_callback(update: Update, context: ContextTypes.DEFAUL
     await query.answer()
 
     user_id = query.from_user.id
-    register_user(user_id)
+    await ensure_registered(update, context)
 
     unjoined = await get_unjoined_channels(update, context)
     if not unjoined:
         await query.edit_message_text(
-            f"{t('verified', user_id)}\n\n"
-            f"{t('send_link', user_id)}"
+            tp(user_id, 'verified', 'send_link')
         )
     else:
         await query.edit_message_text(
-            f"{t('not_joined', user_id)}\n\n"
-            f"{t('join_first_then_click', user_id)}",
+            tp(user_id, 'not_joined', 'join_first_then_click'),
             reply_markup=build_join_keyboard(unjoined, user_id)
         )
 
 
 # ── Admin commands ────────────────────────────────────────────────────────────
+BROADCAST_CONCURRENCY = 25      # max in-flight send_message calls
+BROADCAST_RATE = 28             # messages per second
+BROADCAST_PROGRESS_EVERY = 500  # status message update interval
+
+
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """/broadcast <message> — send message to all users (admin only)."""
     user_id = update.effective_user.id
@@ -406,17 +717,48 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     message_text = " ".join(context.args)
     user_ids = get_all_user_ids()
+    total = len(user_ids)
     sent, failed = 0, 0
 
-    status_msg = await update.message.reply_text(f"⏳ Broadcasting to {len(user_ids)} users...")
-    for uid in user_ids:
-        try:
-            await context.bot.send_message(chat_id=uid, text=message_text)
-            sent += 1
-        except Exception as e:
-            print(f"Broadcast failed for {uid}: {e}")
-            failed += 1
-        await asyncio.sleep(0.05)  # avoid hitting flood limits
+    status_msg = await update.message.reply_text(f"⏳ Broadcasting to {total} users...")
+
+    # Telegram allows ~30 messages/second per bot: bound in-flight requests and
+    # space out send start times to stay just under that.
+    sem = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    pace_lock = asyncio.Lock()
+    next_slot = 0.0
+
+    async def _wait_for_slot():
+        nonlocal next_slot
+        async with pace_lock:
+            now = time.monotonic()
+            delay = next_slot - now
+            next_slot = max(now, next_slot) + 1 / BROADCAST_RATE
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _send(uid):
+        nonlocal sent, failed
+        async with sem:
+            await _wait_for_slot()
+            try:
+                try:
+                    await context.bot.send_message(chat_id=uid, text=message_text)
+                except RetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                    await context.bot.send_message(chat_id=uid, text=message_text)
+                sent += 1
+            except Exception as e:
+                logger.debug("Broadcast failed for %s: %s", uid, e)
+                failed += 1
+        done = sent + failed
+        if done % BROADCAST_PROGRESS_EVERY == 0 and done < total:
+            try:
+                await status_msg.edit_text(f"⏳ Broadcasting... {done}/{total}")
+            except Exception:
+                pass
+
+    await asyncio.gather(*(_send(uid) for uid in user_ids))
 
     await status_msg.edit_text(
         f"✅ Broadcast complete!\n"
@@ -501,59 +843,231 @@ async def send_csv_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ You are not authorized to use this command.")
         return
 
-    df = pd.read_csv(CSV_FILE)
-    total = len(df)
-    with open(CSV_FILE, "rb") as f:
-        await context.bot.send_document(
-            chat_id=user_id,
-            document=f,
-            filename="users.csv",
-            caption=f"📊 Users database — {total} total users."
-        )
+    total = len(_USER_IDS)
+    await context.bot.send_document(
+        chat_id=user_id,
+        document=export_users_csv(),
+        filename="users.csv",
+        write_timeout=UPLOAD_WRITE_TIMEOUT,
+        caption=f"📊 Users database — {total} total users."
+    )
 
 
 # ── SoundCloud helpers ────────────────────────────────────────────────────────
+_YDL_OPTS = {
+    # Prefer mp3, then progressive HTTP streams (fetched natively by
+    # download_soundcloud()); the source file is sent as-is when possible
+    'format': (
+        'bestaudio[ext=mp3][protocol^=http]/bestaudio[protocol^=http]'
+        '/bestaudio[ext=mp3]/bestaudio/best'
+    ),
+    'quiet': True,
+    'no_warnings': True,
+    'noplaylist': True,
+}
+
+# Containers Telegram plays inline as audio; anything else is transcoded to mp3
+PLAYABLE_EXTS = {'.mp3', '.m4a'}
+FFMPEG = shutil.which("ffmpeg")
+if FFMPEG is None:
+    logger.warning("ffmpeg not found on PATH; non-mp3/m4a tracks will be sent untranscoded.")
+
+# yt-dlp is synchronous: metadata extraction and non-HTTP downloads run here.
+# Its network I/O releases the GIL, so threads are effective.
+_DL_EXEC = ThreadPoolExecutor(max_workers=DL_WORKERS, thread_name_prefix="yt-dlp")
+# Caps yt-dlp-driven downloads, which hold a pool thread for the whole transfer
+_DL_SEM = asyncio.Semaphore(DL_WORKERS)
+
+# Progressive HTTP streams hold no thread, so they get a larger limit of their own
+MAX_STREAMS = 32
+_STREAM_SEM = asyncio.Semaphore(MAX_STREAMS)
+
+# Shared client for streaming audio from SoundCloud's CDN; see _http_client()
+_HTTP = None
+
+# link -> {"task": download task, "users": handlers still using the file}
+_INFLIGHT: dict = {}
+
+TRACK_CACHE_FILE = "track_cache.json"
+TRACK_CACHE_SIZE = 10_000
+
+# link -> (Telegram file_id, title), least recently used first
+_FILEID_CACHE: OrderedDict = OrderedDict()
+
+
+def load_track_cache():
+    """Restore the link → file_id map saved by save_track_cache()."""
+    if not os.path.exists(TRACK_CACHE_FILE):
+        return
+    try:
+        for link, (file_id, title) in read_json(TRACK_CACHE_FILE).items():
+            _FILEID_CACHE[link] = (file_id, title)
+    except Exception as e:
+        logger.error("Failed to load %s: %s", TRACK_CACHE_FILE, e)
+
+
+def save_track_cache():
+    """Persist the link → file_id map to TRACK_CACHE_FILE."""
+    write_json(TRACK_CACHE_FILE, _FILEID_CACHE)
+
+
+def get_cached_track(link: str):
+    """Return (file_id, title) of a track already uploaded to Telegram, or None."""
+    hit = _FILEID_CACHE.get(link)
+    if hit:
+        _FILEID_CACHE.move_to_end(link)
+    return hit
+
+
+def cache_track(link: str, file_id: str, title: str):
+    _FILEID_CACHE[link] = (file_id, title)
+    _FILEID_CACHE.move_to_end(link)
+    while len(_FILEID_CACHE) > TRACK_CACHE_SIZE:
+        _FILEID_CACHE.popitem(last=False)
+    schedule_save(save_track_cache)
+
+
+def forget_track(link: str):
+    if _FILEID_CACHE.pop(link, None):
+        schedule_save(save_track_cache)
+
+
+_SC_RE = re.compile(r'https?://(?:www\.)?(?:soundcloud\.com|on\.soundcloud\.com)/\S+', re.IGNORECASE)
+
+
 def extract_soundcloud_link(text: str):
-    pattern = r'https?://(?:www\.)?(?:soundcloud\.com|on\.soundcloud\.com)/[^\s]+'
-    match = re.search(pattern, text, re.IGNORECASE)
-    return match.group(0) if match else None
-
-
-def download_soundcloud(link: str):
-    """Download SoundCloud track; returns (file_path, title) or (None, None)."""
-    temp_dir = tempfile.gettempdir()
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'quiet': True,
-        'no_warnings': True,
-        'extractaudio': True,
-        'audioformat': 'mp3',
-        'audioquality': '0',
-        'noplaylist': True,
-    }
+    """First SoundCloud link in text, normalised so it can key the caches:
+    query and fragment (share/tracking params) dropped, host lowercased."""
+    match = _SC_RE.search(text)
+    if not match:
+        return None
+    parts = urlsplit(match.group(0))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+
+
+def upload_filename(title: str, file_path: str) -> str:
+    """File name users see when saving the audio: sanitized title + the file's extension."""
+    safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    safe_title = safe_title[:100] or "track"
+    return safe_title + os.path.splitext(file_path)[1]
+
+
+def _extract_info(link: str) -> dict:
+    """Resolve a track's metadata and selected audio format without downloading."""
+    with yt_dlp.YoutubeDL(_YDL_OPTS) as ydl:
+        return ydl.extract_info(link, download=False)
+
+
+def _ydl_download(info: dict, temp_dir: str) -> str:
+    """Let yt-dlp fetch an already-resolved track (e.g. HLS streams); returns the file path."""
+    # Name files by track ID so two tracks with the same title can't collide
+    opts = {**_YDL_OPTS, 'outtmpl': os.path.join(temp_dir, '%(id)s.%(ext)s')}
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.process_ie_result(info, download=True)
+        downloads = info.get('requested_downloads') or [{}]
+        return downloads[0].get('filepath') or ydl.prepare_filename(info)
+
+
+def _http_client() -> httpx.AsyncClient:
+    global _HTTP
+    if _HTTP is None:
+        _HTTP = httpx.AsyncClient(follow_redirects=True, timeout=httpx.Timeout(30, read=60))
+    return _HTTP
+
+
+async def _stream_to_file(url: str, headers: dict, file_path: str):
+    async with _http_client().stream("GET", url, headers=headers) as resp:
+        resp.raise_for_status()
+        # Network reads stay on the event loop; disk I/O goes to worker threads
+        f = await asyncio.to_thread(open, file_path, "wb")
+        try:
+            async for chunk in resp.aiter_bytes(1 << 16):
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+async def _ensure_playable(file_path: str) -> str:
+    """Transcode to mp3 with ffmpeg only if Telegram can't play the container."""
+    root, ext = os.path.splitext(file_path)
+    if ext.lower() in PLAYABLE_EXTS or FFMPEG is None:
+        return file_path
+    out_path = root + ".mp3"
+    proc = await asyncio.create_subprocess_exec(
+        FFMPEG, "-loglevel", "error", "-y", "-i", file_path,
+        "-vn", "-c:a", "libmp3lame", "-q:a", "0", out_path,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    _, err = await proc.communicate()
+    if proc.returncode != 0:
+        logger.warning("ffmpeg failed for %s: %s", file_path, err.decode(errors="replace").strip())
+        return file_path
+    return out_path
+
+
+async def download_soundcloud(link: str):
+    """Download SoundCloud track; returns (file_path, title, temp_dir) or (None, None, None).
+
+    Metadata extraction runs in the yt-dlp pool. Progressive HTTP streams are
+    then fetched with the async HTTP client (file writes in worker threads);
+    other protocols are left to yt-dlp.
+    Each download gets its own temp_dir; the caller removes it when done.
+    """
+    temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix="sc_")
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(link, download=False)
-            title = info.get('title', 'track')
-            safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            safe_title = safe_title[:100] or "track"
-            output_template = os.path.join(temp_dir, f"{safe_title}.%(ext)s")
-            ydl_opts['outtmpl'] = output_template
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl2:
-                ydl2.download([link])
-            for ext in ['mp3', 'm4a', 'opus', 'webm', 'ogg', 'flac']:
-                fp = os.path.join(temp_dir, f"{safe_title}.{ext}")
-                if os.path.exists(fp):
-                    return fp, title
-            # Fallback: scan temp dir for recently created file matching title
-            for file in os.listdir(temp_dir):
-                fp = os.path.join(temp_dir, file)
-                if os.path.isfile(fp) and safe_title.lower() in file.lower():
-                    if time.time() - os.path.getmtime(fp) < 60:
-                        return fp, title
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(_DL_EXEC, _extract_info, link)
+        if info.get('protocol') in ('http', 'https') and info.get('url'):
+            file_path = os.path.join(temp_dir, f"{info['id']}.{info.get('ext') or 'mp3'}")
+            async with _STREAM_SEM:
+                await _stream_to_file(info['url'], info.get('http_headers') or {}, file_path)
+        else:
+            async with _DL_SEM:
+                file_path = await loop.run_in_executor(_DL_EXEC, _ydl_download, info, temp_dir)
+        if os.path.exists(file_path):
+            file_path = await _ensure_playable(file_path)
+            return file_path, info.get('title', 'track'), temp_dir
     except Exception as e:
-        print(f"Error downloading SoundCloud track: {e}")
-    return None, None
+        logger.warning("Error downloading SoundCloud track: %s", e)
+    await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
+    return None, None, None
+
+
+async def acquire_track(link: str):
+    """Download link, or join a download of the same link already in progress.
+
+    Every call must be paired with release_track(link), even on failure.
+    """
+    entry = _INFLIGHT.get(link)
+    if entry is None:
+        entry = _INFLIGHT[link] = {"task": asyncio.create_task(download_soundcloud(link)), "users": 0}
+    entry["users"] += 1
+    file_path, title, _ = await asyncio.shield(entry["task"])
+    return file_path, title
+
+
+async def release_track(link: str):
+    """Drop one user of a shared download; the last one deletes its temp dir."""
+    entry = _INFLIGHT[link]
+    entry["users"] -= 1
+    if entry["users"] > 0:
+        return
+    del _INFLIGHT[link]
+    task = entry["task"]
+    if not task.done():
+        # Every waiter was cancelled mid-download; clean up once it finishes
+        task.add_done_callback(_remove_download)
+        return
+    await asyncio.to_thread(_remove_download, task)
+
+
+def _remove_download(task: asyncio.Task):
+    if task.cancelled() or task.exception():
+        return
+    _, _, temp_dir = task.result()
+    if temp_dir:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.debug("Deleted temp dir: %s", temp_dir)
 
 
 # ── Message handler ───────────────────────────────────────────────────────────
@@ -562,91 +1076,164 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     user_id = user.id
 
-    is_new = register_user(user_id)
-    if is_new:
-        await notify_new_user(context, user_id, user)
+    await ensure_registered(update, context)
 
     if user_id not in user_languages:
-        keyboard = [
-            [InlineKeyboardButton("English 🇺🇸", callback_data="lang_en")],
-            [InlineKeyboardButton("فارسی 🇮🇷", callback_data="lang_fa")]
-        ]
         await update.message.reply_text(
             "Please select your language / لطفا زبان خود را انتخاب کنید",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return
-
-    unjoined = await get_unjoined_channels(update, context)
-    if unjoined:
-        await update.message.reply_text(
-            f"{t('need_join', user_id)}\n\n{t('join_and_click', user_id)}",
-            reply_markup=build_join_keyboard(unjoined, user_id)
+            reply_markup=_LANG_KEYBOARD
         )
         return
 
+    # Cheap regex first, so plain chat messages never cost a membership API call
     message_text = update.message.text or ""
     soundcloud_link = extract_soundcloud_link(message_text)
 
     if not soundcloud_link:
         await update.message.reply_text(
-            f"{t('invalid_link', user_id)}\n\n{t('link_example', user_id)}"
+            tp(user_id, 'invalid_link', 'link_example')
         )
         return
 
+    unjoined = await get_unjoined_channels(update, context)
+    if unjoined:
+        await update.message.reply_text(
+            tp(user_id, 'need_join', 'join_and_click'),
+            reply_markup=build_join_keyboard(unjoined, user_id)
+        )
+        return
+
+    cached = get_cached_track(soundcloud_link)
+    if cached:
+        # Already uploaded once: resend by file_id, no download or upload needed
+        file_id, title = cached
+        try:
+            await context.bot.send_audio(
+                chat_id=update.effective_chat.id,
+                audio=file_id,
+                title=title,
+                performer="SoundCloud",
+                caption=f"🎵 {title}"
+            )
+            return
+        except BadRequest as e:
+            # Telegram rejected the file_id itself: it is stale, download afresh
+            logger.warning("Cached file_id rejected for %s: %s", soundcloud_link, e)
+            forget_track(soundcloud_link)
+        except Exception as e:
+            # Transient (network/timeout): keep the entry, just fall back to downloading
+            logger.warning("Cached file_id send failed for %s: %s", soundcloud_link, e)
+
     processing_msg = await update.message.reply_text(t('downloading', user_id))
 
+    released = False
     try:
-        loop = asyncio.get_event_loop()
-        file_path, title = await loop.run_in_executor(None, download_soundcloud, soundcloud_link)
+        file_path, title = await acquire_track(soundcloud_link)
 
         if not file_path or not os.path.exists(file_path):
             await processing_msg.edit_text(
-                f"{t('download_failed', user_id)}\n\n{t('link_check', user_id)}"
+                tp(user_id, 'download_failed', 'link_check')
             )
             return
 
         try:
-            with open(file_path, 'rb') as audio_file:
-                sent_message = await context.bot.send_audio(
-                    chat_id=update.effective_chat.id,
-                    audio=audio_file,
-                    title=title,
-                    performer="SoundCloud",
-                    caption=f"🎵 {title}"
-                )
-            if sent_message:
-                try:
-                    os.remove(file_path)
-                    print(f"Deleted temp file: {file_path}")
-                except Exception as e:
-                    print(f"Error deleting file {file_path}: {e}")
-            await processing_msg.edit_text(t('success', user_id))
+            # PTB loads the whole upload into memory anyway; do the read in a
+            # worker thread so a large file doesn't stall the event loop.
+            audio_bytes = await asyncio.to_thread(Path(file_path).read_bytes)
+            sent_message = await context.bot.send_audio(
+                chat_id=update.effective_chat.id,
+                audio=audio_bytes,
+                filename=upload_filename(title, file_path),
+                write_timeout=UPLOAD_WRITE_TIMEOUT,
+                title=title,
+                performer="SoundCloud",
+                caption=f"🎵 {title}"
+            )
+            if sent_message.audio:
+                cache_track(soundcloud_link, sent_message.audio.file_id, title)
+            # The status edit and temp-dir cleanup are independent; overlap them
+            released = True
+            results = await asyncio.gather(
+                processing_msg.edit_text(t('success', user_id)),
+                release_track(soundcloud_link),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning("Post-send step failed: %s", result)
         except Exception as send_error:
-            print(f"Error sending audio file: {send_error}")
+            logger.warning("Error sending audio file: %s", send_error)
             await processing_msg.edit_text(
-                f"{t('send_failed', user_id)}\n\n{t('downloaded_not_sent', user_id)}"
+                tp(user_id, 'send_failed', 'downloaded_not_sent')
             )
-    except Exception as e:
-        print(f"Error processing SoundCloud link: {e}")
+    except Exception:
+        logger.exception("Error processing SoundCloud link")
         await processing_msg.edit_text(
-            f"{t('error_occurred', user_id)}\n\n{t('try_again', user_id)}"
+            tp(user_id, 'error_occurred', 'try_again')
         )
+    finally:
+        if not released:
+            await release_track(soundcloud_link)
 
 
 # ── Main ──────────────────────────────────────────────────────────────────────
+_background_tasks: list = []
+
+
+async def post_init(application: Application):
+    _background_tasks.append(asyncio.create_task(user_writer_loop()))
+    _background_tasks.append(asyncio.create_task(admin_refresh_loop(application.bot)))
+
+
+async def post_shutdown(application: Application):
+    for task in _background_tasks:
+        task.cancel()
+    # Let cancelled tasks run their cleanup (the writer flushes its pending batch)
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    if _HTTP is not None:
+        await _HTTP.aclose()
+    # Drop the debounce timers and flush what they were waiting to write
+    for task in _pending_saves.values():
+        task.cancel()
+    _pending_saves.clear()
+    flush_user_rows()
+    save_track_cache()
+
+
 def main():
-    print("Starting Telegram SoundCloud Downloader Bot...")
+    level_raw = os.getenv("LOGLEVEL", "INFO").strip().upper()
+    level = logging.getLevelNamesMapping().get(level_raw)
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        level=logging.INFO if level is None else level,
+    )
+    if level is None:
+        logger.warning("LOGLEVEL %r is not a valid level, using INFO.", level_raw)
+    # httpx logs every Telegram API request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logger.info("Starting Telegram SoundCloud Downloader Bot...")
 
     init_db()
     channels = load_sponsor_channels()
-    print(f"Sponsor channels ({len(channels)}): {channels}")
+    logger.info("Sponsor channels (%d): %s", len(channels), channels)
     if ADMIN_USER_ID:
-        print(f"Admin user ID: {ADMIN_USER_ID}")
+        logger.info("Admin user ID: %s", ADMIN_USER_ID)
     if REPORT_CHANNEL:
-        print(f"Report channel: {REPORT_CHANNEL}")
-
-    app = Application.builder().token(BOT_TOKEN).build()
+        logger.info("Report channel: %s", REPORT_CHANNEL)
+
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        # Room for concurrent broadcasts/membership checks/uploads without
+        # waiting on the default 8-connection pool; keep-alive reuses TLS sessions.
+        # PTB ignores the client write timeout for file uploads (it uses 20 s), so
+        # uploads pass write_timeout=UPLOAD_WRITE_TIMEOUT per call instead.
+        .request(HTTPXRequest(connection_pool_size=64, read_timeout=30, pool_timeout=5))
+        .get_updates_request(HTTPXRequest(connection_pool_size=16))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Core handlers
     app.add_handler(CommandHandler("start", start_command))
@@ -661,7 +1248,7 @@ def main():
     app.add_handler(CommandHandler("list_channels", list_channels_command))
     app.add_handler(CommandHandler("send_csv", send_csv_command))
 
-    print("Bot is running...")
+    logger.info("Bot is running...")
     app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 